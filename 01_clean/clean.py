@@ -6,15 +6,15 @@ Outputs:
   - 01_output/: Markdown files (human-readable)
   - 02_structured/: JSONL files with full metadata for RAG injection
 """
-import json
-import re
 from pathlib import Path
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from dataclasses import dataclass, field
 from typing import Optional
 
 import fitz  # PyMuPDF
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+import orjson
+import regex as re  # drop-in for stdlib re with a faster matching engine
+from semantic_text_splitter import TextSplitter
 
 
 # Article patterns for French legal codes
@@ -37,6 +37,22 @@ HIERARCHY_PATTERNS = [
     (r"SOUS-SECTION\s+(\d+|[IVX]+)", "sous_section"),
 ]
 
+# Compiled once at import time: these run against every line of every PDF
+ARTICLE_REGEXES = [re.compile(p, re.IGNORECASE) for p in ARTICLE_PATTERNS]
+ANY_ARTICLE_REGEX = re.compile("|".join(f"(?:{p})" for p in ARTICLE_PATTERNS), re.IGNORECASE)
+ARTICLE_START_REGEX = re.compile(r"^(Article|Art\.)", re.IGNORECASE)
+# Most lines are plain article text: reject them before the detailed scans
+LINE_PREFILTER = re.compile(
+    r"^(?:Article\b|Art\.|PARTIE\s|LIVRE\s|TITRE\s|CHAPITRE\s|SECTION\s|SOUS-SECTION\s)",
+    re.IGNORECASE,
+)
+HIERARCHY_REGEXES = [(re.compile(p, re.IGNORECASE), level) for p, level in HIERARCHY_PATTERNS]
+HIERARCHY_PREFIXES = ("PARTIE", "LIVRE", "TITRE", "CHAPIT", "SECTIO", "SOUS-S")
+
+# Splitter is stateless: build it once per process rather than once per PDF.
+# Rust-backed; splits on paragraph > line > sentence > word boundaries.
+TEXT_SPLITTER = TextSplitter(capacity=1000, overlap=150)
+
 
 @dataclass
 class HierarchyTracker:
@@ -51,6 +67,9 @@ class HierarchyTracker:
     # Store titles associated with each level
     titles: dict = field(default_factory=dict)
 
+    # Formatted hierarchy, rebuilt only after an update
+    _cache: Optional[list[str]] = field(default=None, init=False, repr=False, compare=False)
+
     LEVELS = ["partie", "livre", "titre", "chapitre", "section", "sous_section"]
 
     def update(self, level: str, value: str, title: Optional[str] = None):
@@ -58,6 +77,7 @@ class HierarchyTracker:
         if level not in self.LEVELS:
             return
 
+        self._cache = None
         setattr(self, level, value)
         if title:
             self.titles[level] = title
@@ -69,7 +89,13 @@ class HierarchyTracker:
             self.titles.pop(lower_level, None)
 
     def get_hierarchy(self) -> list[str]:
-        """Return current hierarchy as a list of strings."""
+        """Return current hierarchy as a list of strings.
+
+        The list is shared until the next update: copy it before mutating.
+        """
+        if self._cache is not None:
+            return self._cache
+
         result = []
         for level in self.LEVELS:
             value = getattr(self, level)
@@ -81,6 +107,7 @@ class HierarchyTracker:
                     result.append(f"{level_name} {value} - {title}")
                 else:
                     result.append(f"{level_name} {value}")
+        self._cache = result
         return result
 
     def get_hierarchy_string(self) -> str:
@@ -92,8 +119,8 @@ def load_legifrance_mapping(script_dir: Path) -> dict:
     """Load the Legifrance ID to code name/URL mapping."""
     mapping_file = script_dir / "legifrance_mapping.json"
     if mapping_file.exists():
-        with open(mapping_file, "r", encoding="utf-8") as f:
-            return json.load(f)
+        with open(mapping_file, "rb") as f:
+            return orjson.loads(f.read())
     return {}
 
 
@@ -118,8 +145,12 @@ def get_code_info(pdf_path: Path, mapping: dict) -> dict:
 
 def extract_article_id(text: str) -> Optional[str]:
     """Extract article ID from text using patterns."""
-    for pattern in ARTICLE_PATTERNS:
-        match = re.search(pattern, text, re.IGNORECASE)
+    # Fast reject: a single scan tells us whether any pattern can match
+    if not ANY_ARTICLE_REGEX.search(text):
+        return None
+
+    for regex in ARTICLE_REGEXES:
+        match = regex.search(text)
         if match:
             # Normalize the article ID (replace en-dash with hyphen)
             article_id = match.group(1).replace("–", "-").replace(" ", "")
@@ -128,32 +159,31 @@ def extract_article_id(text: str) -> Optional[str]:
 
 
 def detect_hierarchy_change(line: str) -> Optional[tuple[str, str, Optional[str]]]:
-    """Detect if a line indicates a hierarchy change.
+    """Detect if a (stripped) line indicates a hierarchy change.
 
     Returns: (level, value, title) or None
     """
-    line_upper = line.upper().strip()
+    # Only upper-case the short prefix, not the whole line
+    if not line[:8].upper().startswith(HIERARCHY_PREFIXES):
+        return None
 
-    for pattern, level in HIERARCHY_PATTERNS:
-        match = re.search(pattern, line_upper)
+    for regex, level in HIERARCHY_REGEXES:
+        match = regex.search(line)
         if match:
-            value = match.group(1)
-            # Try to extract title (text after the hierarchy marker)
-            title = None
-            full_match = re.search(pattern + r"[:\s]*(.+)?", line_upper)
-            if full_match and full_match.group(2):
-                title = full_match.group(2).strip()
+            value = match.group(1).upper()
+            # Title is whatever follows the hierarchy marker
+            title = line[match.end():].lstrip(": \t").strip() or None
             return (level, value, title)
 
     return None
 
 
 def extract_title_from_next_lines(lines: list[str], start_idx: int) -> Optional[str]:
-    """Extract title from lines following a hierarchy marker."""
+    """Extract title from (already stripped) lines following a hierarchy marker."""
     for i in range(start_idx, min(start_idx + 3, len(lines))):
-        line = lines[i].strip()
+        line = lines[i]
         # Skip empty lines and lines that look like article references
-        if line and not re.match(r"^(Article|Art\.)", line, re.IGNORECASE):
+        if line and not ARTICLE_START_REGEX.match(line):
             # Check if it looks like a title (not too long, no article pattern)
             if len(line) < 200 and not extract_article_id(line):
                 return line
@@ -181,14 +211,25 @@ def process_pdf_with_hierarchy(file_path: Path) -> list[dict]:
 
     for page_num in range(len(pdf)):
         page = pdf[page_num]
-        text = str(page.get_text("text"))
-        lines = text.split("\n")
-
-        for i, line in enumerate(lines):
-            line_stripped = line.strip()
+        # Blocks are (x0, y0, x1, y1, text, block_no, block_type); type 1 is an image.
+        # Lines are stripped once here and passed as-is to the helpers below.
+        lines = [
+            line.strip()
+            for block in page.get_text("blocks")
+            if block[6] == 0
+            for line in block[4].splitlines()
+        ]
+
+        for i, line_stripped in enumerate(lines):
             if not line_stripped:
                 continue
 
+            # Plain text line: only relevant as article content
+            if not LINE_PREFILTER.match(line_stripped):
+                if current_article_id:
+                    current_article_content.append(line_stripped)
+                continue
+
             # Check for hierarchy changes
             hierarchy_change = detect_hierarchy_change(line_stripped)
             if hierarchy_change:
@@ -233,8 +274,22 @@ def process_pdf_with_hierarchy(file_path: Path) -> list[dict]:
     return articles
 
 
-def create_enriched_content(article: dict, code_info: dict) -> str:
-    """Create enriched content with context prefix for embedding."""
+def merge_small_chunks(chunks: list[str], max_size: int = 1000, min_size: int = 100) -> list[str]:
+    """Merge tiny fragments into their neighbour when the result still fits in max_size."""
+    merged = []
+    for chunk in chunks:
+        if merged:
+            previous = merged[-1]
+            small = len(previous) < min_size or len(chunk) < min_size
+            if small and len(previous) + len(chunk) + 1 <= max_size:
+                merged[-1] = f"{previous}\n{chunk}"
+                continue
+        merged.append(chunk)
+    return merged
+
+
+def create_enriched_prefix(article: dict, code_info: dict) -> str:
+    """Create the context prefix (source, hierarchy, article, URL) for embedding."""
     parts = [f"Source: {code_info['source_book']}"]
 
     if article["hierarchy"]:
@@ -242,8 +297,7 @@ def create_enriched_content(article: dict, code_info: dict) -> str:
 
     parts.append(f"Article {article['article_id']}")
     parts.append(f"URL: {code_info['source_url']}")
-    parts.append("")  # Empty line before content
-    parts.append(article["content"])
+    parts.append("\n")  # Empty line before content
 
     return "\n".join(parts)
 
@@ -256,65 +310,55 @@ def process_single_pdf(pdf_file: Path, output_md_path: Path, output_json_path: P
     # Extract articles with hierarchy
     articles = process_pdf_with_hierarchy(pdf_file)
 
-    # Generate Markdown output (human-readable)
-    md_lines = [f"# {code_info['source_book']}\n"]
-    md_lines.append(f"Source: {code_info['source_url']}\n")
-    md_lines.append(f"LEGITEXT ID: {code_info['legitext_id']}\n")
-    md_lines.append("---\n")
+    # Generate Markdown output (human-readable): one entry per line, "" for blank lines
+    md_lines = [
+        f"# {code_info['source_book']}",
+        "",
+        f"Source: {code_info['source_url']}",
+        "",
+        f"LEGITEXT ID: {code_info['legitext_id']}",
+        "",
+        "---",
+    ]
 
     current_hierarchy = []
     for article in articles:
         # Add hierarchy headers when they change
         if article["hierarchy"] != current_hierarchy:
             current_hierarchy = article["hierarchy"]
-            md_lines.append(f"\n## {' > '.join(current_hierarchy)}\n")
+            md_lines.append("")
+            md_lines.append(f"## {' > '.join(current_hierarchy)}")
 
-        md_lines.append(f"\n### Article {article['article_id']}\n")
-        md_lines.append(f"*Page {article['page']}*\n")
-        md_lines.append(f"\n{article['content']}\n")
+        md_lines.append("")
+        md_lines.append(f"### Article {article['article_id']}")
+        md_lines.append("")
+        md_lines.append(f"*Page {article['page']}*")
+        md_lines.append("")
+        md_lines.append(article["content"])
 
     # Write Markdown
     md_file = output_md_path / f"{pdf_file.stem}.md"
-    with open(md_file, "w", encoding="utf-8") as f:
-        f.write("\n".join(md_lines))
-
-    # Create chunks with enriched content for RAG
-    text_splitter = RecursiveCharacterTextSplitter(
-        separators=["\n\n", "\n", " ", ""],
-        chunk_size=1000,
-        chunk_overlap=150
-    )
+    md_file.write_text("\n".join(md_lines) + "\n", encoding="utf-8")
 
-    chunks = []
+    # Create chunks with enriched content for RAG, serialized straight into one buffer
+    buf = bytearray()
+    num_chunks = 0
     for article in articles:
-        enriched_content = create_enriched_content(article, code_info)
+        # Same metadata prefix for every chunk of the article
+        prefix = create_enriched_prefix(article, code_info)
+        enriched_content = prefix + article["content"]
 
         # Split if content is too long
         if len(enriched_content) > 1000:
             # Split the article content, keeping metadata prefix
-            content_chunks = text_splitter.split_text(article["content"])
-            for i, chunk_content in enumerate(content_chunks):
-                # Recreate enriched content for each chunk
-                chunk_article = article.copy()
-                chunk_article["content"] = chunk_content
-                enriched = create_enriched_content(chunk_article, code_info)
-
-                chunks.append({
-                    "page_content": enriched,
-                    "metadata": {
-                        "source": pdf_file.name,
-                        "source_book": code_info["source_book"],
-                        "source_url": code_info["source_url"],
-                        "legitext_id": code_info["legitext_id"],
-                        "article_id": article["article_id"],
-                        "hierarchy": article["hierarchy"],
-                        "page": article["page"],
-                        "chunk_index": i
-                    }
-                })
+            content_chunks = merge_small_chunks(TEXT_SPLITTER.chunks(article["content"]))
+            page_contents = [prefix + chunk_content for chunk_content in content_chunks]
         else:
-            chunks.append({
-                "page_content": enriched_content,
+            page_contents = [enriched_content]
+
+        for i, page_content in enumerate(page_contents):
+            buf += orjson.dumps({
+                "page_content": page_content,
                 "metadata": {
                     "source": pdf_file.name,
                     "source_book": code_info["source_book"],
@@ -323,17 +367,18 @@ def process_single_pdf(pdf_file: Path, output_md_path: Path, output_json_path: P
                     "article_id": article["article_id"],
                     "hierarchy": article["hierarchy"],
                     "page": article["page"],
-                    "chunk_index": 0
+                    "chunk_index": i
                 }
             })
+            buf += b"\n"
+            num_chunks += 1
 
-    # Write JSONL
+    # Write JSONL in a single call
     json_file = output_json_path / f"{pdf_file.stem}.jsonl"
-    with open(json_file, "w", encoding="utf-8") as f:
-        for chunk in chunks:
-            f.write(json.dumps(chunk, ensure_ascii=False) + "\n")
+    with open(json_file, "wb") as f:
+        f.write(buf)
 
-    return pdf_file.name, len(articles), len(chunks)
+    return pdf_file.name, len(articles), num_chunks
 
 
 def process_folder(input_folder: Path, output_md_folder: Path, output_json_folder: Path,
@@ -362,7 +407,8 @@ def process_folder(input_folder: Path, output_md_folder: Path, output_json_folde
     total_articles = 0
     total_chunks = 0
 
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+    # PDF parsing and regex matching are CPU-bound and hold the GIL: use processes
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
         futures = {
             executor.submit(
                 process_single_pdf, pdf_file, output_md_path, output_json_path, mapping
@@ -403,10 +449,10 @@ def validate_output(output_json_folder: Path):
     }
 
     for jsonl_file in jsonl_files:
-        with open(jsonl_file, "r", encoding="utf-8") as f:
+        with open(jsonl_file, "rb") as f:
             for line_num, line in enumerate(f, 1):
                 try:
-                    chunk = json.loads(line)
+                    chunk = orjson.loads(line)
                     stats["total_chunks"] += 1
 
                     metadata = chunk.get("metadata", {})
@@ -425,7 +471,7 @@ def validate_output(output_json_folder: Path):
                     if metadata.get("source_url"):
                         stats["chunks_with_url"] += 1
 
-                except json.JSONDecodeError as e:
+                except orjson.JSONDecodeError as e:
                     issues.append(f"{jsonl_file.name}:{line_num} - JSON error: {e}")
 
     print(f"  Total chunks: {stats['total_chunks']}")
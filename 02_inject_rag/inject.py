@@ -1,46 +1,146 @@
-import json
+import itertools
+import uuid
+import orjson
+import torch
 from pathlib import Path
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from langchain_qdrant import QdrantVectorStore
-from langchain_huggingface import HuggingFaceEmbeddings
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from langchain_core.documents import Document
 from qdrant_client import QdrantClient
 from qdrant_client.http import models
+from transformers import AutoModel, AutoTokenizer
 
-def inject_to_qdrant(chunks, collection_name="law_library"):
-    # Using a standard open-source embedding model
-    embeddings = HuggingFaceEmbeddings(model_name="BAAI/bge-small-en-v1.5")
+EMBEDDING_MODEL = "BAAI/bge-small-en-v1.5"
+EMBEDDING_DIM = 384
+EMBEDDING_MAX_TOKENS = 512
+
+
+def embed_texts(texts, tokenizer, model, device, batch_size=256):
+    """Embed texts with BGE (CLS pooling, L2-normalized), as sentence-transformers does.
+
+    The whole list is tokenized in one call to the Rust fast tokenizer, then
+    fed to the model in GPU-sized slices.
+    """
+    encoded = tokenizer(
+        texts,
+        padding=True,
+        truncation=True,
+        max_length=EMBEDDING_MAX_TOKENS,
+        return_tensors="pt",
+    )
+    vectors = []
+    with torch.inference_mode():
+        for start in range(0, len(texts), batch_size):
+            inputs = {key: value[start:start + batch_size].to(device) for key, value in encoded.items()}
+            cls = model(**inputs).last_hidden_state[:, 0].float()
+            vectors.append(torch.nn.functional.normalize(cls, p=2, dim=1).cpu())
+    return torch.cat(vectors).tolist()
+
+
+def ensure_collection(client, collection_name):
+    """Create the collection (or migrate an existing one) with int8 quantization.
+
+    Full-precision vectors live on disk; the int8 scalar-quantized copy, 4x
+    smaller, stays in RAM and is what HNSW search walks. Search rescoring
+    against the originals is requested at query time (see 05_serve/backend/rag.py).
+    """
+    quantization_config = models.ScalarQuantization(
+        scalar=models.ScalarQuantizationConfig(
+            type=models.ScalarType.INT8,
+            always_ram=True,
+        )
+    )
+    if not client.collection_exists(collection_name):
+        client.create_collection(
+            collection_name=collection_name,
+            vectors_config=models.VectorParams(
+                size=EMBEDDING_DIM,
+                distance=models.Distance.COSINE,
+                on_disk=True,
+            ),
+            quantization_config=quantization_config,
+        )
+    else:
+        client.update_collection(
+            collection_name=collection_name,
+            vectors_config={"": models.VectorParamsDiff(on_disk=True)},
+            quantization_config=quantization_config,
+        )
+
+
+def inject_to_qdrant(batches, collection_name="law_library", upload_workers=8):
+    # Nothing to do (and no model to load) when there are no documents
+    batches = iter(batches)
+    first_batch = next(batches, None)
+    if first_batch is None:
+        print("No documents to inject.")
+        return
+    batches = itertools.chain([first_batch], batches)
+
+    # Using a standard open-source embedding model, on GPU (in bf16) when available
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    dtype = torch.bfloat16 if device == "cuda" else torch.float32
+    tokenizer = AutoTokenizer.from_pretrained(EMBEDDING_MODEL, use_fast=True)
+    model = AutoModel.from_pretrained(EMBEDDING_MODEL, torch_dtype=dtype).to(device).eval()
     
     url = "http://localhost:6333"
-    
-    # Initialize Vector Store and upload
-    vector_store = QdrantVectorStore.from_documents(
-        chunks,
-        embeddings,
-        url=url,
+    # gRPC avoids JSON encoding of every vector on upload
+    client = QdrantClient(url=url, prefer_grpc=True, grpc_port=6334)
+
+    ensure_collection(client, collection_name)
+
+    # Embed each batch as it is loaded and stream the points into a single
+    # upload_points call, so one worker pool shards the whole upload across
+    # parallel connections. Payloads are {"page_content", "metadata"}, as
+    # 03_query and 05_serve read them.
+    total = 0
+
+    def points():
+        nonlocal total
+        for batch in batches:
+            vectors = embed_texts([doc.page_content for doc in batch], tokenizer, model, device)
+            for doc, vector in zip(batch, vectors):
+                yield models.PointStruct(
+                    id=uuid.uuid4().hex,
+                    vector=vector,
+                    payload={"page_content": doc.page_content, "metadata": doc.metadata},
+                )
+            total += len(batch)
+            print(f"  Embedded {total} chunks")
+
+    client.upload_points(
         collection_name=collection_name,
+        points=points(),
+        parallel=upload_workers,
+        wait=False,
     )
-    print(f"Successfully injected {len(chunks)} chunks into Qdrant.")
+    print(f"Successfully injected {total} chunks into Qdrant.")
+
 
 def load_single_jsonl(jsonl_file):
     """Load a single JSONL file and return Document objects."""
-    documents = []
-    with open(jsonl_file, "r", encoding="utf-8") as f:
-        for line in f:
-            chunk_data = json.loads(line)
-            doc = Document(
-                page_content=chunk_data["page_content"],
-                metadata=chunk_data["metadata"]
-            )
-            documents.append(doc)
+    # Bytes lines go straight to orjson's C parser, no text-mode decode
+    with open(jsonl_file, "rb") as f:
+        chunks_data = [orjson.loads(line) for line in f]
+    documents = [
+        Document(
+            page_content=chunk_data["page_content"],
+            metadata=chunk_data["metadata"]
+        )
+        for chunk_data in chunks_data
+    ]
     return jsonl_file.name, documents
 
 
-def load_jsonl_files(input_folder, max_workers=4):
-    """Load all .jsonl files and convert them to Document objects.
+def iter_jsonl_batches(input_folder, batch_size=512, max_workers=4):
+    """Stream all .jsonl files as batches of Document objects.
+
+    At most max_workers files are loaded ahead of the consumer, so memory
+    stays bounded by the batch and a few files instead of the whole corpus.
 
     Args:
         input_folder: Path to folder containing JSONL files
+        batch_size: Number of documents per yielded batch
         max_workers: Maximum number of threads for parallel loading
     """
     input_path = Path(input_folder)
@@ -48,37 +148,49 @@ def load_jsonl_files(input_folder, max_workers=4):
 
     if not jsonl_files:
         print(f"No JSONL files found in {input_folder}")
-        return []
+        return
 
     print(f"Loading {len(jsonl_files)} JSONL files with {max_workers} workers...")
 
-    all_documents = []
+    pending = []
+    total = 0
     with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        futures = {
-            executor.submit(load_single_jsonl, jsonl_file): jsonl_file
-            for jsonl_file in jsonl_files
-        }
+        files = iter(jsonl_files)
+        in_flight = deque()
+        for jsonl_file in files:
+            in_flight.append((jsonl_file, executor.submit(load_single_jsonl, jsonl_file)))
+            if len(in_flight) >= max_workers:
+                break
+
+        while in_flight:
+            jsonl_file, future = in_flight.popleft()
+            next_file = next(files, None)
+            if next_file is not None:
+                in_flight.append((next_file, executor.submit(load_single_jsonl, next_file)))
 
-        for future in as_completed(futures):
-            jsonl_file = futures[future]
             try:
                 file_name, documents = future.result()
-                all_documents.extend(documents)
-                print(f"  {file_name}: {len(documents)} documents")
             except Exception as e:
                 print(f"  Error loading {jsonl_file.name}: {e}")
+                continue
+            total += len(documents)
+            print(f"  {file_name}: {len(documents)} documents")
 
-    print(f"Total: {len(all_documents)} documents loaded")
-    return all_documents
+            pending.extend(documents)
+            start = 0
+            while len(pending) - start >= batch_size:
+                yield pending[start:start + batch_size]
+                start += batch_size
+            del pending[:start]
+
+    if pending:
+        yield pending
+    print(f"Total: {total} documents loaded")
 
 
 if __name__ == "__main__":
     script_dir = Path(__file__).parent
     input_folder = script_dir.parent / "01_clean" / "02_structured"
 
-    # Load all documents from JSONL files
-    documents = load_jsonl_files(input_folder)
-
-    if documents:
-        # Inject into Qdrant
-        inject_to_qdrant(documents)
\ No newline at end of file
+    # Stream documents from JSONL files straight into Qdrant
+    inject_to_qdrant(iter_jsonl_batches(input_folder))
@@ -1,45 +1,72 @@
 #!/usr/bin/env python3
 import argparse
+import asyncio
 import sys
-from langchain_qdrant import QdrantVectorStore
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_community.llms import Ollama
-from langchain_anthropic import ChatAnthropic
-from qdrant_client import QdrantClient
+from functools import lru_cache
+from operator import attrgetter
+
+# LangChain, Qdrant and torch are imported inside the functions that need
+# them, so --help answers immediately and --vanilla never loads embeddings
 
 # Default configuration
 DEFAULT_OLLAMA_URL = "http://192.168.1.58:8889/"
 DEFAULT_OLLAMA_MODEL = "Qwen3 4B Instruct"
 DEFAULT_CLAUDE_MODEL = "claude-sonnet-4-20250514"
 DEFAULT_QDRANT_URL = "http://localhost:6333"
+DEFAULT_QDRANT_GRPC_PORT = 6334
 DEFAULT_COLLECTION = "law_library"
 
 
 def get_llm(provider, model, url):
-    """Initialize the LLM based on provider."""
+    """Initialize the LLM based on provider.
+
+    Returns (llm, extract) where extract turns a response into its text:
+    ChatAnthropic returns AIMessage, Ollama returns str.
+    """
     if provider == "claude":
-        return ChatAnthropic(model=model)
+        from langchain_anthropic import ChatAnthropic
+        return ChatAnthropic(model=model), attrgetter("content")
     else:
-        return Ollama(model=model, base_url=url)
+        from langchain_ollama import OllamaLLM
+        return OllamaLLM(model=model, base_url=url), lambda response: response
 
 
-def get_vector_store(qdrant_url, collection_name):
-    """Initialize the vector store for RAG."""
-    embeddings = HuggingFaceEmbeddings(model_name="BAAI/bge-small-en-v1.5")
-    return QdrantVectorStore(
-        client=QdrantClient(url=qdrant_url),
-        collection_name=collection_name,
-        embedding=embeddings
+@lru_cache(maxsize=1)
+def get_embeddings():
+    """Load the BGE embedding model once per process."""
+    from langchain_huggingface import HuggingFaceEmbeddings
+    return HuggingFaceEmbeddings(
+        model_name="BAAI/bge-small-en-v1.5",
+        encode_kwargs={"normalize_embeddings": True, "batch_size": 32}
     )
 
 
-def ask(query, llm, vector_store=None):
+def get_retriever(qdrant_url, collection_name):
+    """Initialize RAG retrieval over the Qdrant collection.
+
+    Returns an async retrieve(query, k) that embeds the query and returns the
+    page contents of the k closest chunks, straight from Qdrant's payloads.
+    """
+    from qdrant_client import AsyncQdrantClient
+    client = AsyncQdrantClient(url=qdrant_url, prefer_grpc=True, grpc_port=DEFAULT_QDRANT_GRPC_PORT)
+    embeddings = get_embeddings()
+
+    async def retrieve(query, k=3):
+        response = await client.query_points(
+            collection_name=collection_name,
+            query=await embeddings.aembed_query(query),
+            limit=k,
+            with_payload=True,
+        )
+        return [point.payload["page_content"] for point in response.points]
+
+    return retrieve
+
+
+async def ask(query, llm, extract, retriever=None):
     """Ask a question, optionally using RAG context."""
-    if vector_store:
-        context = "\n".join([
-            doc.page_content
-            for doc in vector_store.similarity_search(query, k=3)
-        ])
+    if retriever:
+        context = "\n".join(await retriever(query, k=3))
         prompt = f"""Tu es un assistant juridique français. Utilise les extraits de loi suivants pour répondre.
 Si la réponse n'est pas dans le contexte, dis que tu ne sais pas.
 
@@ -51,41 +78,50 @@ Question : {query}"""
 
 Question : {query}"""
 
-    response = llm.invoke(prompt)
-    # Handle both Ollama (str) and ChatAnthropic (AIMessage) responses
-    if hasattr(response, 'content'):
-        return response.content
-    return response
+    return extract(await llm.ainvoke(prompt))
 
 
-def chat_mode(llm, vector_store):
+def chat_mode(llm, extract, retriever):
     """Interactive chat loop."""
-    mode = "RAG" if vector_store else "vanilla"
+    mode = "RAG" if retriever else "vanilla"
     print(f"Chat mode ({mode}). Type 'exit' or 'quit' to end.")
 
-    while True:
-        try:
-            query = input("\nYou: ").strip()
-        except (EOFError, KeyboardInterrupt):
-            print("\nGoodbye!")
-            break
-
-        if not query:
-            continue
-        if query.lower() in ("exit", "quit"):
-            print("Goodbye!")
-            break
-
-        response = ask(query, llm, vector_store)
-        print(f"\nAssistant: {response}")
-
-
-def pipe_mode(llm, vector_store):
-    """Read from stdin, write to stdout."""
-    query = sys.stdin.read().strip()
-    if query:
-        response = ask(query, llm, vector_store)
-        print(response)
+    # One event loop for the whole session so async LLM clients can reuse connections
+    with asyncio.Runner() as runner:
+        while True:
+            try:
+                query = input("\nYou: ").strip()
+            except (EOFError, KeyboardInterrupt):
+                print("\nGoodbye!")
+                break
+
+            if not query:
+                continue
+            if query.lower() in ("exit", "quit"):
+                print("Goodbye!")
+                break
+
+            response = runner.run(ask(query, llm, extract, retriever))
+            print(f"\nAssistant: {response}")
+
+
+async def pipe_mode(llm, extract, retriever, batch=False):
+    """Read from stdin, write to stdout.
+
+    With batch=True each non-empty line is a separate question; all of them
+    are sent concurrently and answers are printed in input order, each under
+    a "### <question>" header.
+    """
+    text = sys.stdin.read().strip()
+    if not text:
+        return
+    queries = [line.strip() for line in text.splitlines() if line.strip()] if batch else [text]
+    responses = await asyncio.gather(*[ask(q, llm, extract, retriever) for q in queries])
+    if not batch:
+        print(responses[0])
+        return
+    # Multi-paragraph answers need a header to be matched to their question
+    print("\n\n".join(f"### {q}\n\n{response}" for q, response in zip(queries, responses)))
 
 
 def main():
@@ -98,6 +134,7 @@ Examples:
   %(prog)s --chat --vanilla            # Interactive chat without RAG
   %(prog)s "What is the penalty?"      # Single query with RAG
   echo "question" | %(prog)s           # Pipe input
+  cat questions.txt | %(prog)s --batch # One question per line, run concurrently
   %(prog)s --provider claude           # Use Claude instead of Ollama
   %(prog)s --model "llama3" --url "http://localhost:11434"
 """
@@ -118,6 +155,11 @@ Examples:
         action="store_true",
         help="Disable RAG (no vector store context)"
     )
+    parser.add_argument(
+        "--batch", "-b",
+        action="store_true",
+        help="Pipe mode: treat each input line as a separate question"
+    )
     parser.add_argument(
         "--provider", "-p",
         choices=["ollama", "claude"],
@@ -155,24 +197,24 @@ Examples:
         model = DEFAULT_OLLAMA_MODEL
 
     # Initialize LLM
-    llm = get_llm(args.provider, model, args.url)
+    llm, extract = get_llm(args.provider, model, args.url)
 
-    # Initialize vector store (unless vanilla mode)
-    vector_store = None
+    # Initialize RAG retrieval (unless vanilla mode)
+    retriever = None
     if not args.vanilla:
-        vector_store = get_vector_store(args.qdrant_url, args.collection)
+        retriever = get_retriever(args.qdrant_url, args.collection)
 
     # Determine execution mode
     if args.chat:
-        chat_mode(llm, vector_store)
+        chat_mode(llm, extract, retriever)
     elif args.query:
-        response = ask(args.query, llm, vector_store)
+        response = asyncio.run(ask(args.query, llm, extract, retriever))
         print(response)
     elif not sys.stdin.isatty():
-        pipe_mode(llm, vector_store)
+        asyncio.run(pipe_mode(llm, extract, retriever, batch=args.batch))
     else:
         # No input provided, default to chat mode
-        chat_mode(llm, vector_store)
+        chat_mode(llm, extract, retriever)
 
 
 if __name__ == "__main__":
@@ -4,11 +4,11 @@ Evaluation script to compare RAG vs vanilla responses.
 Runs questions through both modes and generates a comparison report.
 """
 import argparse
+import asyncio
 import importlib.util
 import re
 from datetime import datetime
 from pathlib import Path
-from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # Import query module from sibling directory
 query_path = Path(__file__).parent.parent / "03_query" / "query.py"
@@ -18,7 +18,7 @@ if spec is None or spec.loader is None:
 query = importlib.util.module_from_spec(spec)
 spec.loader.exec_module(query)
 get_llm = query.get_llm
-get_vector_store = query.get_vector_store
+get_retriever = query.get_retriever
 ask = query.ask
 
 # Default configuration
@@ -44,15 +44,36 @@ def parse_questions(questions_file):
     return questions
 
 
-def run_evaluation(question, llm, vector_store):
-    """Run a single question through both vanilla and RAG modes."""
-    # RAG response
-    rag_response = ask(question, llm, vector_store)
+async def run_evaluation(question, llm, extract, retriever):
+    """Run a single question through both vanilla and RAG modes concurrently."""
+    rag_response, vanilla_response = await asyncio.gather(
+        ask(question, llm, extract, retriever),
+        ask(question, llm, extract, retriever=None),
+    )
+    return rag_response, vanilla_response
 
-    # Vanilla response
-    vanilla_response = ask(question, llm, vector_store=None)
 
-    return rag_response, vanilla_response
+async def run_all_evaluations(questions, llm, extract, retriever, parallel=1):
+    """Run all questions, at most `parallel` at a time, keeping question order."""
+    semaphore = asyncio.Semaphore(max(1, parallel))
+
+    async def run_one(q):
+        async with semaphore:
+            print(f"  Processing: {q['title']}...")
+            try:
+                rag_resp, vanilla_resp = await run_evaluation(q["question"], llm, extract, retriever)
+            except Exception as e:
+                print(f"    Error on '{q['title']}': {e}")
+                return None
+            return {
+                "title": q["title"],
+                "question": q["question"],
+                "rag_response": rag_resp,
+                "vanilla_response": vanilla_resp
+            }
+
+    results = await asyncio.gather(*[run_one(q) for q in questions])
+    return [result for result in results if result is not None]
 
 
 def truncate_response(response, max_length=500):
@@ -63,7 +84,7 @@ def truncate_response(response, max_length=500):
     return response
 
 
-def generate_analysis(questions_results, llm):
+def generate_analysis(questions_results, llm, extract):
     """Generate an analysis comparing RAG vs vanilla responses."""
     analysis_prompt = """Analyse la comparaison suivante entre les réponses LLM augmentées par RAG et les réponses LLM classiques pour des questions juridiques.
 
@@ -89,10 +110,7 @@ Réponse classique : {result['vanilla_response'][:1000]}
 
     analysis_prompt += "\nFournis ton analyse :"
 
-    response = llm.invoke(analysis_prompt)
-    if hasattr(response, 'content'):
-        return response.content
-    return response
+    return extract(llm.invoke(analysis_prompt))
 
 
 def generate_report(questions_results, analysis, output_file):
@@ -211,60 +229,20 @@ def main():
     print(f"Found {len(questions)} questions")
 
     print(f"Initializing LLM ({args.provider}: {model})...")
-    llm = get_llm(args.provider, model, args.url)
+    llm, extract = get_llm(args.provider, model, args.url)
 
     print(f"Initializing vector store ({args.qdrant_url})...")
-    vector_store = get_vector_store(args.qdrant_url, args.collection)
+    retriever = get_retriever(args.qdrant_url, args.collection)
 
     print("\nRunning evaluation...")
-    results = []
-
-    if args.parallel > 1:
-        with ThreadPoolExecutor(max_workers=args.parallel) as executor:
-            futures = {
-                executor.submit(
-                    run_evaluation, q["question"], llm, vector_store
-                ): q for q in questions
-            }
-            for future in as_completed(futures):
-                q = futures[future]
-                try:
-                    rag_resp, vanilla_resp = future.result()
-                    results.append({
-                        "title": q["title"],
-                        "question": q["question"],
-                        "rag_response": rag_resp,
-                        "vanilla_response": vanilla_resp
-                    })
-                    print(f"  Completed: {q['title']}")
-                except Exception as e:
-                    print(f"  Error on '{q['title']}': {e}")
-    else:
-        for q in questions:
-            print(f"  Processing: {q['title']}...")
-            try:
-                rag_resp, vanilla_resp = run_evaluation(
-                    q["question"], llm, vector_store
-                )
-                results.append({
-                    "title": q["title"],
-                    "question": q["question"],
-                    "rag_response": rag_resp,
-                    "vanilla_response": vanilla_resp
-                })
-            except Exception as e:
-                print(f"    Error: {e}")
-
-    # Sort results to match original question order
-    title_order = {q["title"]: i for i, q in enumerate(questions)}
-    results.sort(key=lambda x: title_order.get(x["title"], 999))
+    results = asyncio.run(run_all_evaluations(questions, llm, extract, retriever, args.parallel))
 
     # Generate analysis
     analysis = None
     if not args.no_analysis and results:
         print("\nGenerating analysis...")
         try:
-            analysis = generate_analysis(results, llm)
+            analysis = generate_analysis(results, llm, extract)
         except Exception as e:
             print(f"  Analysis failed: {e}")
             analysis = f"Analysis generation failed: {e}"
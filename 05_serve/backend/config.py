@@ -9,20 +9,42 @@ class Config:
     """Application configuration from environment variables."""
 
     # LLM Configuration
+    # LLM calls are async, so concurrent chats reach Ollama together. To have
+    # Ollama actually generate them in parallel, set on the Ollama server:
+    #   OLLAMA_NUM_PARALLEL       requests served concurrently per model
+    #   OLLAMA_MAX_LOADED_MODELS  models kept in memory at once
     llm_provider: Literal["ollama", "claude"] = "ollama"
     ollama_url: str = "http://localhost:11434"
     ollama_model: str = "qwen3:4b"
+    ollama_keep_alive: str = "30m"
+    ollama_num_ctx: int = 8192
     anthropic_api_key: str | None = None
     claude_model: str = "claude-sonnet-4-20250514"
 
     # Qdrant Configuration
     qdrant_url: str = "http://localhost:6333"
+    qdrant_grpc_port: int = 6334
     qdrant_collection: str = "law_library"
+    # Embed queries on the Qdrant server (Qdrant Cloud) instead of locally
+    qdrant_cloud_inference: bool = False
+    # ONNX Runtime threads for local query embedding (None: runtime default)
+    embedding_threads: int | None = None
 
     # Rag research parameters
     top_k: int = 5
+    rag_cache_size: int = 1000  # 0 disables the retrieval cache
+    rag_cache_ttl: int = 300  # seconds
+    # Rescore quantized candidates client-side (see rerank.py) instead of in Qdrant
+    rag_client_rescore: bool = False
+
+    # Chat sessions (server-side history, see /api/session)
+    session_ttl: int = 3600  # seconds of inactivity before a session is dropped
 
     # Server Configuration
+    # main.py runs uvicorn on uvloop with the httptools parser. Both asyncio and
+    # uvloop set TCP_NODELAY on accepted sockets, so small responses and SSE
+    # tokens are not held back by Nagle's algorithm. uvicorn has no HTTP/2;
+    # terminate h2 at a reverse proxy if needed.
     host: str = "0.0.0.0"
     port: int = 8080
 
@@ -37,11 +59,20 @@ class Config:
             llm_provider=llm_provider_str,
             ollama_url=os.getenv("OLLAMA_URL", "http://localhost:11434"),
             ollama_model=os.getenv("OLLAMA_MODEL", "qwen3:4b"),
+            ollama_keep_alive=os.getenv("OLLAMA_KEEP_ALIVE", "30m"),
+            ollama_num_ctx=int(os.getenv("OLLAMA_NUM_CTX", "8192")),
             anthropic_api_key=os.getenv("ANTHROPIC_API_KEY"),
             claude_model=os.getenv("CLAUDE_MODEL", "claude-sonnet-4-20250514"),
             qdrant_url=os.getenv("QDRANT_URL", "http://localhost:6333"),
+            qdrant_grpc_port=int(os.getenv("QDRANT_GRPC_PORT", "6334")),
             qdrant_collection=os.getenv("QDRANT_COLLECTION", "law_library"),
+            qdrant_cloud_inference=os.getenv("QDRANT_CLOUD_INFERENCE", "false").lower() == "true",
+            embedding_threads=int(os.getenv("EMBEDDING_THREADS", "0")) or None,
             top_k=int(os.getenv("RAG_TOP_K", "5")),
+            rag_cache_size=int(os.getenv("RAG_CACHE_SIZE", "1000")),
+            rag_cache_ttl=int(os.getenv("RAG_CACHE_TTL", "300")),
+            rag_client_rescore=os.getenv("RAG_CLIENT_RESCORE", "false").lower() == "true",
+            session_ttl=int(os.getenv("SESSION_TTL", "3600")),
             host=os.getenv("HOST", "0.0.0.0"),
             port=int(os.getenv("PORT", "8080")),
         )
@@ -1,28 +1,47 @@
 """LLM provider abstraction for MLFL."""
-from langchain_community.llms import Ollama
+from collections.abc import AsyncIterator, Callable
+from operator import attrgetter
+
+import httpx
 from langchain_anthropic import ChatAnthropic
+from langchain_ollama import OllamaLLM
 
 from config import config
 
 
 def get_llm():
-    """Initialize the LLM based on configured provider."""
+    """Initialize the LLM based on configured provider.
+
+    Returns (llm, extract) where extract turns a response or stream chunk into
+    text: ChatAnthropic yields AIMessage(Chunk)s, Ollama yields str.
+    """
     if config.llm_provider == "claude":
         return ChatAnthropic(
             model=config.claude_model,
             api_key=config.anthropic_api_key,
-        )
+        ), attrgetter("content")
     else:
-        return Ollama(
+        # The Ollama client keeps one pooled httpx client per instance,
+        # so keep-alive connections are reused across requests
+        return OllamaLLM(
             model=config.ollama_model,
             base_url=config.ollama_url,
-        )
+            # Keep the model (and its prompt KV cache) loaded between requests,
+            # with a context large enough that the prompt prefix is never truncated
+            keep_alive=config.ollama_keep_alive,
+            num_ctx=config.ollama_num_ctx,
+            client_kwargs={
+                "limits": httpx.Limits(max_keepalive_connections=32, max_connections=64),
+            },
+        ), str
+
+
+async def invoke_llm(llm, extract: Callable, prompt: str) -> str:
+    """Invoke LLM asynchronously and return response as string."""
+    return extract(await llm.ainvoke(prompt))
 
 
-def invoke_llm(llm, prompt: str) -> str:
-    """Invoke LLM and return response as string."""
-    response = llm.invoke(prompt)
-    # Handle both Ollama (str) and ChatAnthropic (AIMessage) responses
-    if hasattr(response, "content"):
-        return response.content
-    return str(response)
+async def stream_llm(llm, extract: Callable, prompt: str) -> AsyncIterator[str]:
+    """Stream the LLM response as text chunks, as soon as they are generated."""
+    async for chunk in llm.astream(prompt):
+        yield extract(chunk)
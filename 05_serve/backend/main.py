@@ -1,11 +1,15 @@
 """FastAPI application for My Little French Lawyer."""
 import asyncio
 import logging
+import uuid
+from collections import deque
 from datetime import datetime
 from pathlib import Path
 from typing import Literal
 
-from fastapi import FastAPI, HTTPException, Response
+import orjson
+from cachetools import TTLCache
+from fastapi import FastAPI, HTTPException
 
 # Configure logging for telemetry
 logging.basicConfig(
@@ -14,14 +18,15 @@ logging.basicConfig(
     datefmt="%Y-%m-%d %H:%M:%S",
 )
 logger = logging.getLogger("mlfl")
+LOG_SEPARATOR = "=" * 60
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, StreamingResponse
 from pydantic import BaseModel
 
 from config import config
-from llm import get_llm, invoke_llm
-from rag import get_vector_store, check_qdrant_health, retrieve_context, build_prompt, Source
+from llm import get_llm, invoke_llm, stream_llm
+from rag import check_qdrant_health, retrieve_context, retrieve_context_batch, build_prompt, Source
 
 # Initialize FastAPI
 app = FastAPI(
@@ -41,25 +46,21 @@ app.add_middleware(
 
 # Global instances (lazy loaded)
 _llm = None
-_vector_store = None
+
+# Conversation history per session id (see /api/session), so clients only
+# send the new message. Sessions expire after config.session_ttl idle seconds.
+SESSION_HISTORY_LENGTH = 20
+_sessions: TTLCache = TTLCache(maxsize=10_000, ttl=config.session_ttl)
 
 
 def get_llm_instance():
-    """Get or create LLM instance."""
+    """Get or create the (llm, extract) pair."""
     global _llm
     if _llm is None:
         _llm = get_llm()
     return _llm
 
 
-def get_vector_store_instance():
-    """Get or create vector store instance."""
-    global _vector_store
-    if _vector_store is None:
-        _vector_store = get_vector_store()
-    return _vector_store
-
-
 # Pydantic models
 class Message(BaseModel):
     role: Literal["user", "assistant"]
@@ -69,6 +70,7 @@ class Message(BaseModel):
 
 class ChatRequest(BaseModel):
     message: str
+    session_id: str | None = None  # when set, history is kept server-side
     history: list[Message] = []
     use_rag: bool = True
     selected_codes: list[str] = []
@@ -85,6 +87,10 @@ class ChatResponse(BaseModel):
     sources: list[SourceResponse]
 
 
+class SessionResponse(BaseModel):
+    session_id: str
+
+
 class HealthResponse(BaseModel):
     status: str
     provider: str
@@ -95,74 +101,222 @@ class ExportRequest(BaseModel):
     history: list[Message]
 
 
-# API Routes
-@app.post("/api/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest):
-    """Process a chat message and return response with sources."""
-    try:
-        llm = get_llm_instance()
-        vector_store = get_vector_store_instance()
-
-        # Retrieve context from RAG if enabled
-        sources = []
-        context = None
-
-        # Telemetry: Log request info
-        logger.info("=" * 60)
-        logger.info(f"📝 QUERY: {request.message[:100]}{'...' if len(request.message) > 100 else ''}")
-        logger.info(f"🔧 RAG ENABLED: {request.use_rag}")
-        if request.selected_codes:
-            logger.info(f"📚 SELECTED CODES: {request.selected_codes}")
-
-        if request.use_rag and vector_store:
-            source_books = request.selected_codes if request.selected_codes else None
+def to_source_responses(source_objs: list[Source]) -> list[SourceResponse]:
+    """Convert retrieved sources to their API representation."""
+    return [
+        SourceResponse(
+            content=s.content,
+            metadata=s.metadata,
+            score=s.score,
+        )
+        for s in source_objs
+    ]
+
+
+def get_history(request: ChatRequest) -> list[dict]:
+    """Return the conversation history: the session's, or the one sent in the request.
+
+    Raises 404 for a session id that expired or was not issued by /api/session
+    (e.g. after a restart), so the client can start a new session. A new,
+    still empty session may be seeded with the history sent in the request.
+    """
+    request_history = [{"role": m.role, "content": m.content} for m in request.history]
+    if request.session_id is None:
+        return request_history
+    history = _sessions.get(request.session_id)
+    if history is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired session")
+    if not history:
+        history.extend(request_history)
+    return list(history)
+
+
+def save_turn(request: ChatRequest, response_text: str) -> None:
+    """Append a question and its answer to the request's session, if it still exists."""
+    if request.session_id is None:
+        return
+    history = _sessions.get(request.session_id)
+    if history is None:
+        return
+    history.append({"role": "user", "content": request.message})
+    history.append({"role": "assistant", "content": response_text})
+    _sessions[request.session_id] = history  # also restarts the expiry timer
+
+
+async def prepare_chat(request: ChatRequest) -> tuple[str, list[SourceResponse]]:
+    """Retrieve RAG context (if enabled) and build the LLM prompt for a chat request."""
+    history = get_history(request)
+
+    # Retrieve context from RAG if enabled
+    sources = []
+    context = None
+
+    # Telemetry: Log request info
+    logger.info(LOG_SEPARATOR)
+    logger.info("📝 QUERY: %.100s%s", request.message, "..." if len(request.message) > 100 else "")
+    logger.info("🔧 RAG ENABLED: %s", request.use_rag)
+    if request.selected_codes:
+        logger.info("📚 SELECTED CODES: %s", request.selected_codes)
+
+    if request.use_rag:
+        source_books = request.selected_codes if request.selected_codes else None
+        try:
             context, source_objs = await asyncio.to_thread(
                 retrieve_context,
-                vector_store,
                 request.message,
                 k=config.top_k,
                 source_books=source_books,
             )
-            sources = [
-                SourceResponse(
-                    content=s.content,
-                    metadata=s.metadata,
-                    score=s.score,
-                )
-                for s in source_objs
-            ]
-
-            # Telemetry: Log RAG results
-            logger.info(f"📊 RAG RESULTS: {len(sources)} sources found")
+        except Exception as e:
+            # Answer without context rather than failing when Qdrant is unavailable
+            logger.warning("⚠️  RAG UNAVAILABLE: %s", e)
+            source_objs = []
+        sources = to_source_responses(source_objs)
+
+        # Telemetry: Log RAG results
+        logger.info("📊 RAG RESULTS: %d sources found", len(sources))
+        if logger.isEnabledFor(logging.INFO):
             for i, src in enumerate(source_objs, 1):
                 source_name = src.metadata.get("source", src.metadata.get("filename", "Unknown"))
-                logger.info(f"   [{i}] Score: {src.score:.4f} | Source: {source_name}")
-                logger.info(f"       Preview: {src.content[:80]}...")
+                logger.info("   [%d] Score: %.4f | Source: %s", i, src.score, source_name)
+                logger.info("       Preview: %.80s...", src.content)
 
-            if context:
-                logger.info(f"📄 CONTEXT LENGTH: {len(context)} chars")
-            else:
-                logger.info("⚠️  NO CONTEXT RETRIEVED")
+        if context:
+            logger.info("📄 CONTEXT LENGTH: %d chars", len(context))
         else:
-            logger.info("🚫 RAG SKIPPED (disabled or vector store unavailable)")
+            logger.info("⚠️  NO CONTEXT RETRIEVED")
+    else:
+        logger.info("🚫 RAG SKIPPED (disabled)")
+
+    return build_prompt(request.message, context, history), sources
+
 
-        # Build prompt with history
-        history_dicts = [{"role": m.role, "content": m.content} for m in request.history]
-        prompt = build_prompt(request.message, context, history_dicts)
+def sse_event(event_type: str, data: dict) -> str:
+    """Format a Server-Sent Event carrying a JSON payload tagged with its type."""
+    return f"data: {orjson.dumps({'type': event_type, **data}).decode()}\n\n"
+
+
+# API Routes
+@app.post("/api/chat", response_model=ChatResponse)
+async def chat(request: ChatRequest):
+    """Process a chat message and return response with sources."""
+    try:
+        llm, extract = get_llm_instance()
+        prompt, sources = await prepare_chat(request)
 
         # Get LLM response
-        response_text = await asyncio.to_thread(invoke_llm, llm, prompt)
+        response_text = await invoke_llm(llm, extract, prompt)
 
-        logger.info(f"✅ RESPONSE LENGTH: {len(response_text)} chars")
-        logger.info("=" * 60)
+        logger.info("✅ RESPONSE LENGTH: %d chars", len(response_text))
+        logger.info(LOG_SEPARATOR)
+        save_turn(request, response_text)
 
         return ChatResponse(response=response_text, sources=sources)
 
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"❌ ERROR: {str(e)}")
+        logger.error("❌ ERROR: %s", e)
         raise HTTPException(status_code=500, detail=f"Error processing request: {str(e)}")
 
 
+@app.post("/api/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """Process a chat message and stream the response as Server-Sent Events.
+
+    Events (one JSON object per `data:` line, discriminated by `type`):
+    `sources` once retrieval is done, then one `token` per generated chunk,
+    then `done` (or `error` if generation fails midway).
+    """
+    try:
+        llm, extract = get_llm_instance()
+        prompt, sources = await prepare_chat(request)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("❌ ERROR: %s", e)
+        raise HTTPException(status_code=500, detail=f"Error processing request: {str(e)}")
+
+    async def events():
+        yield sse_event("sources", {"sources": [s.model_dump() for s in sources]})
+        tokens = []
+        try:
+            async for token in stream_llm(llm, extract, prompt):
+                tokens.append(token)
+                yield sse_event("token", {"token": token})
+        except Exception as e:
+            logger.error("❌ ERROR: %s", e)
+            yield sse_event("error", {"detail": f"Error processing request: {str(e)}"})
+            return
+
+        response_text = "".join(tokens)
+        logger.info("✅ RESPONSE LENGTH: %d chars", len(response_text))
+        logger.info(LOG_SEPARATOR)
+        save_turn(request, response_text)
+        yield sse_event("done", {})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.post("/api/chat/batch", response_model=list[ChatResponse])
+async def chat_batch(requests: list[ChatRequest]):
+    """Process several independent chat messages in one call.
+
+    Retrieval for all RAG-enabled messages is a single Qdrant batch query,
+    then the LLM calls run concurrently. Responses keep the request order.
+    """
+    try:
+        llm, extract = get_llm_instance()
+        logger.info("📦 BATCH: %d requests", len(requests))
+        histories = [get_history(request) for request in requests]
+
+        retrieved = {}
+        rag_indexes = [i for i, request in enumerate(requests) if request.use_rag]
+        if rag_indexes:
+            try:
+                batch_results = await asyncio.to_thread(
+                    retrieve_context_batch,
+                    [(requests[i].message, requests[i].selected_codes or None) for i in rag_indexes],
+                    k=config.top_k,
+                )
+                retrieved = dict(zip(rag_indexes, batch_results))
+            except Exception as e:
+                # Answer without context rather than failing when Qdrant is unavailable
+                logger.warning("⚠️  RAG UNAVAILABLE: %s", e)
+
+        results = [retrieved.get(i, (None, [])) for i in range(len(requests))]
+        response_texts = await asyncio.gather(*[
+            invoke_llm(llm, extract, build_prompt(request.message, context, history))
+            for request, history, (context, _) in zip(requests, histories, results)
+        ])
+
+        for request, response_text in zip(requests, response_texts):
+            save_turn(request, response_text)
+
+        return [
+            ChatResponse(response=response_text, sources=to_source_responses(source_objs))
+            for response_text, (_, source_objs) in zip(response_texts, results)
+        ]
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("❌ ERROR: %s", e)
+        raise HTTPException(status_code=500, detail=f"Error processing request: {str(e)}")
+
+
+@app.get("/api/session", response_model=SessionResponse)
+async def create_session():
+    """Start a conversation whose history is kept server-side."""
+    session_id = uuid.uuid4().hex
+    _sessions[session_id] = deque(maxlen=SESSION_HISTORY_LENGTH)
+    return SessionResponse(session_id=session_id)
+
+
 @app.get("/api/health", response_model=HealthResponse)
 async def health():
     """Check system health."""
@@ -181,27 +335,32 @@ async def export_chat(request: ExportRequest, format: Literal["txt", "md"] = "md
     if not request.history:
         raise HTTPException(status_code=400, detail="No messages to export")
 
-    timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-    filename = f"mlfl_conversation_{timestamp}.{format}"
-
-    if format == "md":
-        content = "# My Little French Lawyer - Conversation Export\n\n"
-        content += f"*Exported on {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}*\n\n---\n\n"
+    now = datetime.now()
+    filename = f"mlfl_conversation_{now.strftime('%Y-%m-%d_%H-%M-%S')}.{format}"
+    exported_on = now.strftime("%Y-%m-%d %H:%M:%S")
 
-        for msg in request.history:
-            role = "**You**" if msg.role == "user" else "**Assistant**"
-            content += f"{role}\n\n{msg.content}\n\n---\n\n"
-    else:
-        content = "My Little French Lawyer - Conversation Export\n"
-        content += f"Exported on {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n"
-        content += "=" * 50 + "\n\n"
-
-        for msg in request.history:
-            role = "You" if msg.role == "user" else "Assistant"
-            content += f"{role}:\n{msg.content}\n\n" + "-" * 30 + "\n\n"
+    # Stream one chunk per message so long histories are never built in memory
+    async def export_chunks():
+        if format == "md":
+            yield (
+                "# My Little French Lawyer - Conversation Export\n\n"
+                f"*Exported on {exported_on}*\n\n---\n\n"
+            )
+            for msg in request.history:
+                role = "**You**" if msg.role == "user" else "**Assistant**"
+                yield f"{role}\n\n{msg.content}\n\n---\n\n"
+        else:
+            yield (
+                "My Little French Lawyer - Conversation Export\n"
+                f"Exported on {exported_on}\n"
+                + "=" * 50 + "\n\n"
+            )
+            for msg in request.history:
+                role = "You" if msg.role == "user" else "Assistant"
+                yield f"{role}:\n{msg.content}\n\n" + "-" * 30 + "\n\n"
 
-    return Response(
-        content=content,
+    return StreamingResponse(
+        export_chunks(),
         media_type="text/plain" if format == "txt" else "text/markdown",
         headers={
             "Content-Disposition": f"attachment; filename={filename}"
@@ -230,5 +389,7 @@ if __name__ == "__main__":
         "main:app",
         host=config.host,
         port=config.port,
+        loop="uvloop",
+        http="httptools",
         reload=True,
     )
@@ -1,14 +1,37 @@
 """RAG (Retrieval Augmented Generation) logic for MLFL."""
+import threading
 from dataclasses import dataclass
-from langchain_qdrant import QdrantVectorStore
-from langchain_huggingface import HuggingFaceEmbeddings
+from functools import lru_cache
+
+from cachetools import TTLCache
+from fastembed import TextEmbedding
 from qdrant_client import QdrantClient
 from qdrant_client.http.exceptions import UnexpectedResponse
-from qdrant_client.models import Filter, FieldCondition, MatchAny
+from qdrant_client.models import (
+    Document,
+    FieldCondition,
+    Filter,
+    MatchAny,
+    QuantizationSearchParams,
+    QueryRequest,
+    SearchParams,
+)
 
+import rerank
 from config import config
 
 
+# Embedding model of the law_library collection; queries are sent as
+# Document(text, model) and embedded by the Qdrant inference layer.
+EMBEDDING_MODEL = "BAAI/bge-small-en-v1.5"
+# Model options for local (FastEmbed) inference; the Qdrant server picks its own
+EMBEDDING_OPTIONS = (
+    {"threads": config.embedding_threads}
+    if config.embedding_threads and not config.qdrant_cloud_inference
+    else None
+)
+
+
 @dataclass
 class Source:
     """A source document retrieved from the vector store."""
@@ -18,31 +41,90 @@ class Source:
     score: float = 0.0
 
 
-def get_vector_store() -> QdrantVectorStore | None:
-    """Initialize the vector store for RAG."""
-    try:
-        embeddings = HuggingFaceEmbeddings(model_name="BAAI/bge-small-en-v1.5")
-        return QdrantVectorStore(
-            client=QdrantClient(url=config.qdrant_url),
-            collection_name=config.qdrant_collection,
-            embedding=embeddings,
-        )
-    except Exception:
-        return None
+# The collection stores int8-quantized vectors in RAM (see 02_inject_rag/inject.py):
+# fetch 2x candidates on the quantized index, then rescore them with full vectors.
+SEARCH_PARAMS = SearchParams(
+    quantization=QuantizationSearchParams(rescore=True, oversampling=2.0),
+)
+
+# With client-side rescoring, fetch this many times k candidates from the
+# quantized index and rescore them locally against their full vectors.
+CLIENT_RESCORE_OVERSAMPLING = 4
+CLIENT_RESCORE_PARAMS = SearchParams(
+    quantization=QuantizationSearchParams(rescore=False),
+)
+
+# Recent retrieval results, keyed by normalized query and search parameters.
+# retrieve_context runs in worker threads, hence the lock.
+_retrieval_cache: TTLCache | None = (
+    TTLCache(maxsize=config.rag_cache_size, ttl=config.rag_cache_ttl)
+    if config.rag_cache_size > 0
+    else None
+)
+_retrieval_cache_lock = threading.Lock()
+
+
+@lru_cache(maxsize=1)
+def get_qdrant_client() -> QdrantClient:
+    """Create the Qdrant client once per process and reuse its connections.
+
+    With cloud inference enabled, query text is embedded by the Qdrant server
+    in the same call as the search; otherwise the client embeds it locally
+    with FastEmbed (ONNX, int8-quantized BGE).
+    """
+    return QdrantClient(
+        url=config.qdrant_url,
+        prefer_grpc=True,  # protobuf responses are cheaper to decode than JSON
+        grpc_port=config.qdrant_grpc_port,
+        cloud_inference=config.qdrant_cloud_inference,
+        timeout=5,
+    )
+
+
+@lru_cache(maxsize=1)
+def get_query_embedder() -> TextEmbedding:
+    """Load the FastEmbed query model once per process (client-side rescoring)."""
+    return TextEmbedding(model_name=EMBEDDING_MODEL, threads=config.embedding_threads)
 
 
 def check_qdrant_health() -> bool:
     """Check if Qdrant is accessible."""
     try:
-        client = QdrantClient(url=config.qdrant_url)
-        client.get_collections()
+        get_qdrant_client().get_collections()
         return True
     except (UnexpectedResponse, Exception):
         return False
 
 
+def build_source_filter(source_books: list[str] | None) -> Filter | None:
+    """Build a Qdrant filter restricting results to the given codes, if any."""
+    if not source_books:
+        return None
+    return Filter(
+        must=[
+            FieldCondition(
+                key="metadata.legitext_id",
+                match=MatchAny(any=source_books),
+            )
+        ]
+    )
+
+
+def points_to_sources(points) -> tuple[str, list[Source]]:
+    """Build the context string and sources from Qdrant scored points."""
+    sources = [
+        Source(
+            content=point.payload.get("page_content", ""),
+            metadata=point.payload.get("metadata") or {},
+            score=point.score,
+        )
+        for point in points
+    ]
+    context = "\n\n---\n\n".join([source.content for source in sources])
+    return context, sources
+
+
 def retrieve_context(
-    vector_store: QdrantVectorStore,
     query: str,
     k: int = 5,
     source_books: list[str] | None = None,
@@ -50,47 +132,108 @@ def retrieve_context(
     """Retrieve relevant documents and return context string with sources.
 
     Args:
-        vector_store: The Qdrant vector store instance.
         query: The search query.
         k: Number of results to return.
-        score_threshold: Minimum similarity score.
         source_books: Optional list of source_book values to filter by.
     """
-    # Build filter if source_books are specified
-    qdrant_filter = None
-    if source_books:
-        qdrant_filter = Filter(
-            must=[
-                FieldCondition(
-                    key="metadata.legitext_id",
-                    match=MatchAny(any=source_books),
-                )
-            ]
-        )
+    return retrieve_context_batch([(query, source_books)], k)[0]
 
-    docs_with_scores = vector_store.similarity_search_with_score(
-        query,
-        k=k,
-        filter=qdrant_filter,
-    )
 
-    # Build sources from results
-    sources = [
-        Source(
-            content=doc.page_content,
-            metadata=doc.metadata or {},
-            score=score,
-        )
-        for doc, score in docs_with_scores
+def retrieve_context_batch(
+    requests: list[tuple[str, list[str] | None]],
+    k: int = 5,
+) -> list[tuple[str, list[Source]]]:
+    """Retrieve context for several independent queries in a single Qdrant round trip.
+
+    This is the one retrieval path of the backend (retrieve_context is a batch
+    of one), so every endpoint gets the same caching and rescoring.
+
+    Args:
+        requests: (query, source_books) pairs, each with its own code filter.
+        k: Number of results to return per query.
+
+    Returns one (context, sources) pair per request, in order. Results are
+    cached for config.rag_cache_ttl seconds; the BGE model is uncased, so the
+    cache key ignores case and surrounding whitespace.
+    """
+    cache_keys = [
+        (query.strip().lower(), k, tuple(sorted(source_books or ())))
+        for query, source_books in requests
     ]
+    results = [None] * len(requests)
+    if _retrieval_cache is not None:
+        with _retrieval_cache_lock:
+            results = [_retrieval_cache.get(cache_key) for cache_key in cache_keys]
 
-    context = "\n\n---\n\n".join([doc.page_content for doc, _ in docs_with_scores])
-    return context, sources
+    misses = [i for i, result in enumerate(results) if result is None]
+    if misses:
+        search = _search_rescored if config.rag_client_rescore else _search
+        for i, result in zip(misses, search([requests[i] for i in misses], k)):
+            results[i] = result
+        if _retrieval_cache is not None:
+            with _retrieval_cache_lock:
+                for i in misses:
+                    _retrieval_cache[cache_keys[i]] = results[i]
+    return results
 
 
-def build_prompt(query: str, context: str | None = None, history: list[dict] | None = None) -> str:
-    """Build the prompt for the LLM."""
-    system_prompt = """Tu es un assistant juridique français spécialisé dans le conseil et l'analyse de textes légaux.
+def _search(requests, k):
+    """Embed and search all queries in one query_batch_points call."""
+    responses = get_qdrant_client().query_batch_points(
+        collection_name=config.qdrant_collection,
+        requests=[
+            QueryRequest(
+                query=Document(text=query, model=EMBEDDING_MODEL, options=EMBEDDING_OPTIONS),
+                limit=k,
+                filter=build_source_filter(source_books),
+                params=SEARCH_PARAMS,
+                with_payload=True,
+            )
+            for query, source_books in requests
+        ],
+    )
+    return [points_to_sources(response.points) for response in responses]
+
+
+def _search_rescored(requests, k):
+    """Search all queries, rescoring oversampled candidates on the client.
+
+    Qdrant only searches its quantized index and returns the candidates with
+    their full vectors; the final top k is picked locally (see rerank.py).
+    """
+    query_vectors = list(get_query_embedder().query_embed([query for query, _ in requests]))
+    responses = get_qdrant_client().query_batch_points(
+        collection_name=config.qdrant_collection,
+        requests=[
+            QueryRequest(
+                query=query_vector.tolist(),
+                limit=k * CLIENT_RESCORE_OVERSAMPLING,
+                filter=build_source_filter(source_books),
+                params=CLIENT_RESCORE_PARAMS,
+                with_payload=True,
+                with_vector=True,
+            )
+            for query_vector, (_, source_books) in zip(query_vectors, requests)
+        ],
+    )
+
+    results = []
+    for query_vector, response in zip(query_vectors, responses):
+        points = response.points
+        if not points:
+            results.append(points_to_sources([]))
+            continue
+        indices, scores = rerank.top_k(query_vector, [point.vector for point in points], k)
+        results.append(points_to_sources([
+            points[i].model_copy(update={"score": float(score)})
+            for i, score in zip(indices, scores)
+        ]))
+    return results
+
+
+# Static part of the prompt, kept first and byte-identical across requests so
+# the LLM server can reuse its KV cache for this prefix (prompt caching)
+SYSTEM_PROMPT = """Tu es un assistant juridique français spécialisé dans le conseil et l'analyse de textes légaux.
     Ta mission est d'aider les utilisateurs à comprendre le droit français avec rigueur et précision.
 
     RÈGLES CRITIQUES :
@@ -101,23 +244,35 @@ def build_prompt(query: str, context: str | None = None, history: list[dict] | N
 
     Réponds toujours dans la même langue que l'utilisateur."""
 
-    if context:
-        system_prompt += f"""
-    ---
+CONTEXT_TEMPLATE = """---
     CONTEXTE JURIDIQUE À UTILISER PRIORITAIREMENT :
     {context}
     ---
     INSTRUCTION FINALE : Si le contexte ci-dessus ne contient pas la solution spécifique à la question, réponds : "D'après les documents consultés, je ne dispose pas d'assez d'informations pour répondre précisément. Pourriez-vous clarifier votre demande ?"."""
-        
 
 
-    # Build conversation history
-    messages = [system_prompt]
+@lru_cache(maxsize=512)
+def _format_history(history: tuple[tuple[str, str], ...]) -> str:
+    """Format (role, content) pairs as prompt lines, caching repeated windows."""
+    return "\n\n".join(
+        f"{'User' if role == 'user' else 'Assistant'}: {content}" for role, content in history
+    )
+
+
+def build_prompt(query: str, context: str | None = None, history: list[dict] | None = None) -> str:
+    """Build the prompt for the LLM.
+
+    Order goes from most to least stable: system prompt, conversation history,
+    then the per-question context right before the question itself.
+    """
+    messages = [SYSTEM_PROMPT]
 
     if history:
-        for msg in history[-6:]:  # Keep last 6 messages for context
-            role = "User" if msg["role"] == "user" else "Assistant"
-            messages.append(f"{role}: {msg['content']}")
+        # Keep last 6 messages for context
+        messages.append(_format_history(tuple((msg["role"], msg["content"]) for msg in history[-6:])))
+
+    if context:
+        messages.append(CONTEXT_TEMPLATE.format(context=context))
 
     messages.append(f"User: {query}")
     messages.append("Assistant:")
@@ -0,0 +1,53 @@
+"""Client-side rescoring of Qdrant candidates for MLFL."""
+import numpy as np
+
+try:
+    import simsimd
+except ImportError:
+    simsimd = None
+
+try:
+    from numba import njit, prange
+except ImportError:
+    njit = None
+
+if njit is not None:
+    @njit(fastmath=True, parallel=True, cache=True)
+    def _dot_scores(query, candidates):
+        scores = np.empty(candidates.shape[0], dtype=np.float32)
+        for i in prange(candidates.shape[0]):
+            acc = np.float32(0.0)
+            for j in range(candidates.shape[1]):
+                acc += query[j] * candidates[i, j]
+            scores[i] = acc
+        return scores
+else:
+    def _dot_scores(query, candidates):
+        return candidates @ query
+
+
+def cosine_scores(query_vector, candidate_vectors) -> np.ndarray:
+    """Cosine similarity between one query and each candidate vector.
+
+    Uses SimSIMD's SIMD kernels when installed, otherwise a Numba kernel (or
+    NumPy without Numba). The fallbacks assume L2-normalized vectors, as BGE
+    embeddings and vectors stored in a cosine collection are, so cosine is a
+    plain dot product.
+    """
+    query = np.ascontiguousarray(query_vector, dtype=np.float32)
+    candidates = np.ascontiguousarray(candidate_vectors, dtype=np.float32)
+    if simsimd is not None:
+        distances = simsimd.cdist(query.reshape(1, -1), candidates, metric="cosine")
+        return 1.0 - np.asarray(distances, dtype=np.float32).ravel()
+    return _dot_scores(query, candidates)
+
+
+def top_k(query_vector, candidate_vectors, k: int) -> tuple[np.ndarray, np.ndarray]:
+    """Return (indices, scores) of the k best candidates, best first."""
+    scores = cosine_scores(query_vector, candidate_vectors)
+    if k < len(scores):
+        indices = np.argpartition(-scores, k)[:k]
+    else:
+        indices = np.arange(len(scores))
+    indices = indices[np.argsort(-scores[indices])]
+    return indices, scores[indices]
@@ -10,6 +10,8 @@ export default function App() {
   const [error, setError] = useState(null)
   const [useRag, setUseRag] = useState(true)
   const [selectedCodes, setSelectedCodes] = useState([])
+  // History is kept server-side per session; a new one starts on the first message
+  const [sessionId, setSessionId] = useState(null)
 
   const sendMessage = useCallback(async (content) => {
     const timestamp = new Date().toISOString()
@@ -19,39 +21,95 @@ export default function App() {
     setError(null)
     setIsLoading(true)
 
-    try {
-      const response = await fetch('/api/chat', {
+    let streamStarted = false
+
+    const createSession = async () => {
+      const sessionResponse = await fetch('/api/session')
+      if (!sessionResponse.ok) throw new Error(`Erreur ${sessionResponse.status}`)
+      const newSessionId = (await sessionResponse.json()).session_id
+      setSessionId(newSessionId)
+      return newSessionId
+    }
+
+    const postMessage = (currentSessionId, history = []) =>
+      fetch('/api/chat/stream', {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify({
           message: content,
-          history: messages,
+          session_id: currentSessionId,
+          history,
           use_rag: useRag,
           selected_codes: selectedCodes,
         }),
       })
 
+    try {
+      let response = await postMessage(sessionId || (await createSession()))
+
+      // Session expired or backend restarted: start a new session seeded
+      // with the conversation shown on screen
+      if (response.status === 404) {
+        response = await postMessage(await createSession(), messages)
+      }
+
       if (!response.ok) {
         const errorData = await response.json().catch(() => ({}))
         throw new Error(errorData.detail || `Erreur ${response.status}`)
       }
 
-      const data = await response.json()
-
-      const assistantMessage = {
-        role: 'assistant',
-        content: data.response,
-        timestamp: new Date().toISOString(),
+      // Parse Server-Sent Events: "data: {json}" blocks separated by a blank line
+      const reader = response.body.getReader()
+      const decoder = new TextDecoder()
+      let buffer = ''
+
+      const handleEvent = (data) => {
+        if (data.type === 'sources') {
+          // Store sources indexed by message position
+          if (data.sources.length > 0) {
+            setSources((prev) => ({
+              ...prev,
+              [messages.length + 1]: data.sources,
+            }))
+          }
+        } else if (data.type === 'token') {
+          if (!streamStarted) {
+            streamStarted = true
+            setMessages((prev) => [
+              ...prev,
+              { role: 'assistant', content: data.token, timestamp: new Date().toISOString() },
+            ])
+          } else {
+            setMessages((prev) => {
+              const last = prev[prev.length - 1]
+              return [...prev.slice(0, -1), { ...last, content: last.content + data.token }]
+            })
+          }
+        } else if (data.type === 'error') {
+          throw new Error(data.detail)
+        }
       }
 
-      setMessages((prev) => [...prev, assistantMessage])
+      while (true) {
+        const { done, value } = await reader.read()
+        if (done) break
+
+        buffer += decoder.decode(value, { stream: true })
+        const events = buffer.split('\n\n')
+        buffer = events.pop()
+        for (const event of events) {
+          if (event.startsWith('data: ')) {
+            handleEvent(JSON.parse(event.slice(6)))
+          }
+        }
+      }
 
-      // Store sources indexed by message position
-      if (data.sources && data.sources.length > 0) {
-        setSources((prev) => ({
+      // Keep sources aligned with an assistant message even for an empty answer
+      if (!streamStarted) {
+        setMessages((prev) => [
           ...prev,
-          [messages.length + 1]: data.sources,
-        }))
+          { role: 'assistant', content: '', timestamp: new Date().toISOString() },
+        ])
       }
     } catch (err) {
       console.error('Chat error:', err)
@@ -69,12 +127,13 @@ export default function App() {
     } finally {
       setIsLoading(false)
     }
-  }, [messages, useRag, selectedCodes])
+  }, [messages, sessionId, useRag, selectedCodes])
 
   const clearChat = useCallback(() => {
     setMessages([])
     setSources({})
     setError(null)
+    setSessionId(null)
   }, [])
 
   const exportChat = useCallback(async (format) => {
@@ -35,9 +35,9 @@ export default function ChatWindow({ messages, sources, isLoading }) {
                 />
               ))}
 
-              {/* Typing indicator */}
+              {/* Typing indicator, until the first streamed token arrives */}
               <AnimatePresence>
-                {isLoading && <TypingIndicator />}
+                {isLoading && messages[messages.length - 1]?.role !== 'assistant' && <TypingIndicator />}
               </AnimatePresence>
             </motion.div>
           )}